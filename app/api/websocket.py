@@ -1,6 +1,7 @@
-import json
 import logging
-import base64
+import msgpack
+import orjson
+import pybase64
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.core.websocket import manager
 from app.services.audio_service import audio_service
@@ -14,9 +15,22 @@ async def websocket_endpoint(websocket: WebSocket):
     logger.info("WebSocket client connected")
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
             try:
-                message = json.loads(data)
+                if data.get("bytes") is not None:
+                    try:
+                        message = msgpack.unpackb(data["bytes"], raw=False)
+                    except ValueError as e:
+                        logger.error(f"Invalid MessagePack received: {str(e)}")
+                        await manager.send_json(websocket, {
+                            "type": "error",
+                            "message": "Invalid MessagePack message"
+                        })
+                        continue
+                else:
+                    message = orjson.loads(data["text"])
                 message_type = message.get("type")
                 logger.debug(f"Received WebSocket message type: {message_type}")
                 
@@ -28,7 +42,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         "session_id": session_id
                     }
                     logger.info(f"Starting recording session: {session_id}")
-                    await websocket.send_json(response)
+                    await manager.send_json(websocket, response)
                     
                 elif message_type == "stop_recording":
                     audio_service.stop_recording_session()
@@ -37,7 +51,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         "status": "recording_stopped"
                     }
                     logger.info("Stopping recording session")
-                    await websocket.send_json(response)
+                    await manager.send_json(websocket, response)
                     
                 elif message_type == "audio_data":
                     audio_data = message.get("audio")
@@ -47,8 +61,9 @@ async def websocket_endpoint(websocket: WebSocket):
                     
                     logger.debug("Processing audio chunk")
                     result = await audio_service.process_audio_chunk(audio_data)
-                    logger.info(f"Sending WebSocket response: {result}")
-                    await websocket.send_json(result)
+                    if result:
+                        logger.info(f"Sending WebSocket response: {result}")
+                        await manager.send_json(websocket, result)
 
                 elif message_type == "play_audio":
                     session_id = message.get("session_id")
@@ -63,7 +78,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     )
                     
                     if audio_segment:
-                        audio_base64 = base64.b64encode(audio_segment).decode('utf-8')
+                        audio_base64 = pybase64.b64encode_as_string(audio_segment)
                         response = {
                             "type": "audio_segment",
                             "session_id": session_id,
@@ -71,9 +86,9 @@ async def websocket_endpoint(websocket: WebSocket):
                             "end_time": end_time,
                             "audio": audio_base64
                         }
-                        await websocket.send_json(response)
+                        await manager.send_json(websocket, response)
                     else:
-                        await websocket.send_json({
+                        await manager.send_json(websocket, {
                             "type": "error",
                             "message": "Audio segment not found"
                         })
@@ -88,7 +103,7 @@ async def websocket_endpoint(websocket: WebSocket):
                             "session_id": session_id
                         }
                         logger.info(f"Starting recording session: {session_id}")
-                        await websocket.send_json(response)
+                        await manager.send_json(websocket, response)
                     elif status == "stop_recording":
                         audio_service.stop_recording_session()
                         response = {
@@ -96,10 +111,10 @@ async def websocket_endpoint(websocket: WebSocket):
                             "status": "recording_stopped"
                         }
                         logger.info("Stopping recording session")
-                        await websocket.send_json(response)
+                        await manager.send_json(websocket, response)
                     else:
                         logger.warning(f"Unknown status: {status}")
-                        await websocket.send_json({
+                        await manager.send_json(websocket, {
                             "type": "error",
                             "message": f"Unknown status: {status}"
                         })
@@ -107,20 +122,20 @@ async def websocket_endpoint(websocket: WebSocket):
                 else:
                     error_msg = f"Unknown message type: {message_type}"
                     logger.warning(error_msg)
-                    await websocket.send_json({
+                    await manager.send_json(websocket, {
                         "type": "error",
                         "message": error_msg
                     })
                     
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Invalid JSON received: {str(e)}")
-                await websocket.send_json({
+                await manager.send_json(websocket, {
                     "type": "error",
                     "message": "Invalid JSON message"
                 })
             except Exception as e:
                 logger.error(f"Error processing WebSocket message: {str(e)}")
-                await websocket.send_json({
+                await manager.send_json(websocket, {
                     "type": "error",
                     "message": f"Error processing message: {str(e)}"
                 })
@@ -1,27 +1,37 @@
+import asyncio
 import logging
-from typing import List
+import orjson
+from typing import Dict, Set
 from fastapi import WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:   
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
 
     async def connect(self, websocket: WebSocket) -> None:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
         logger.info(f"New client connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket) -> None:
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
 
-    async def broadcast(self, message: str) -> None:
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except WebSocketDisconnect:
+    async def send_json(self, websocket: WebSocket, message: Dict) -> None:
+        await websocket.send_text(orjson.dumps(message).decode())
+
+    async def broadcast(self, payload: bytes) -> None:
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_bytes(payload) for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, WebSocketDisconnect):
                 self.disconnect(connection)
+            elif isinstance(result, Exception):
+                logger.error(f"Error broadcasting to client: {str(result)}")
 
 manager = ConnectionManager() 
\ No newline at end of file
@@ -1,28 +1,81 @@
-import base64
+import io
 import logging
+import pybase64
 import numpy as np
-import whisper
+from faster_whisper import WhisperModel
 import torch
 import asyncio
-import json
+import orjson
 import soundfile as sf
+from scipy.signal import firwin, upfirdn
 import os
-from typing import Dict, Optional
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 from .diarization_service import diarization_service
 
 logger = logging.getLogger(__name__)
 
+# resample_poly's default anti-aliasing filter for 48 kHz -> 16 kHz, designed
+# once, with the int16 -> [-1, 1) normalization folded into the taps.
+_DECIMATE_TAPS = (firwin(2 * 10 * 3 + 1, 1.0 / 3, window=("kaiser", 5.0)) / 32768.0).astype(np.float32)
+
+class StreamingDecimator:
+    """
+    Low-pass filters and decimates a stream of int16 chunks, carrying the filter
+    history and decimation phase across chunks. The concatenated output of
+    process() followed by flush() equals resample_poly over the whole stream.
+    """
+    def __init__(self, taps: np.ndarray = _DECIMATE_TAPS, down: int = 3):
+        self.taps = taps
+        self.down = down
+        self.half_len = (len(taps) - 1) // 2
+        # Extra history so the first output sits on a multiple of down in upfirdn's output
+        self._pad = -(len(taps) - 1) % down
+        self._lookback = len(taps) - 1 + self._pad
+        self._history = np.zeros(self._lookback, dtype=np.int16)
+        self._history_start = -self._lookback
+        self._next_out = 0
+        self._n_in = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        self._n_in += len(chunk)
+        buf = np.concatenate((self._history, chunk))
+        return self._emit(buf, (self._n_in - 1 - self.half_len) // self.down)
+
+    def flush(self) -> np.ndarray:
+        buf = np.concatenate((self._history, np.zeros(self.half_len + self.down, dtype=np.int16)))
+        return self._emit(buf, -(-self._n_in // self.down) - 1)
+
+    def _emit(self, buf: np.ndarray, last_out: int) -> np.ndarray:
+        count = last_out - self._next_out + 1
+        out = np.empty(0, dtype=np.float32)
+        if count > 0:
+            first = self.down * self._next_out + self.half_len - self._lookback - self._history_start
+            seg = buf[first:first + self._lookback + self.down * (count - 1) + 1]
+            skip = self._lookback // self.down
+            out = upfirdn(self.taps, seg, 1, self.down)[skip:skip + count]
+            self._next_out += count
+        keep = self.down * self._next_out + self.half_len - self._lookback - self._history_start
+        self._history = buf[keep:].copy()
+        self._history_start += keep
+        return out
+
 class AudioService:
     def __init__(self):
         self.sample_rate = 16000
         self.current_session: Optional[str] = None
-        self.audio_buffer = []
-        self.full_audio_buffer = []
+        self.audio_buffer: List[np.ndarray] = []
+        self.full_audio_buffer: List[np.ndarray] = []
+        self._buf_samples = 0
+        self._last_transcribed_samples = 0
+        self._decimator = StreamingDecimator()
+        self.max_window_samples = self.sample_rate * 30
         self.processing_lock = asyncio.Lock()
         self.whisper_model = None
+        self._infer_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
         self.processing_task = None
-        self.recording_start_time = None
+        self.recording_start_time: Optional[float] = None
         self.audio_dir = "recordings"
         self.session_start_times: Dict[str, float] = {}
         self.initialize_models()
@@ -35,30 +88,43 @@ class AudioService:
     def initialize_models(self):
         try:
             device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.whisper_model = whisper.load_model("base", device=device)
-            logger.info(f"Whisper model loaded on {device}")
+            compute_type = "int8_float16" if device == "cuda" else "int8"
+            self.whisper_model = WhisperModel("base", device=device, compute_type=compute_type)
+            logger.info(f"Whisper model loaded on {device} ({compute_type})")
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
 
     def start_recording_session(self) -> str:
-        self.current_session = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.current_session = f"{time.time_ns():x}"
         self.audio_buffer = []
         self.full_audio_buffer = []
-        self.recording_start_time = datetime.now()
-        self.session_start_times[self.current_session] = self.recording_start_time.timestamp()
+        self._buf_samples = 0
+        self._last_transcribed_samples = 0
+        self._decimator = StreamingDecimator()
+        self.recording_start_time = time.time()
+        self.session_start_times[self.current_session] = self.recording_start_time
         logger.info(f"Started new recording session: {self.current_session} at {self.session_start_times[self.current_session]}")
         return self.current_session
 
     def stop_recording_session(self) -> None:
-        if self.audio_buffer:
-            asyncio.create_task(self._process_buffer(final=True))
+        self._append_audio(self._decimator.flush())
+        if self._buf_samples:
+            asyncio.create_task(self._process_buffer(
+                final=True,
+                pending=self.audio_buffer,
+                offset_samples=self._last_transcribed_samples,
+                session_id=self.current_session,
+                start_time=self.recording_start_time
+            ))
         if self.full_audio_buffer:
             self._save_recording()
         logger.info(f"Stopped recording session: {self.current_session}")
         self.current_session = None
         self.audio_buffer = []
         self.full_audio_buffer = []
+        self._buf_samples = 0
+        self._last_transcribed_samples = 0
         self.recording_start_time = None
 
     def _save_recording(self):
@@ -66,7 +132,7 @@ class AudioService:
             logger.warning("Attempted to save recording without an active session")
             return
         try:
-            audio_data = np.array(self.full_audio_buffer)
+            audio_data = np.concatenate(self.full_audio_buffer)
             filename = os.path.join(self.audio_dir, f"{self.current_session}.wav")
             sf.write(filename, audio_data, self.sample_rate)
             logger.info(f"Saved recording to {filename}")
@@ -94,31 +160,28 @@ class AudioService:
             relative_end = end_time - session_start
             logger.info(f"Session start: {session_start}, Converted to relative timestamps: {relative_start}s to {relative_end}s")
 
-            audio_data, sr = sf.read(filename)
-            if sr != self.sample_rate:
-                logger.warning(f"Sample rate mismatch: file has {sr}Hz, expected {self.sample_rate}Hz")
+            with sf.SoundFile(filename) as f:
+                sr = f.samplerate
+                if sr != self.sample_rate:
+                    logger.warning(f"Sample rate mismatch: file has {sr}Hz, expected {self.sample_rate}Hz")
 
-            start_sample = int(relative_start * sr)
-            end_sample = int(relative_end * sr)
-            
-            if start_sample < 0 or end_sample > len(audio_data):
-                logger.error(f"Invalid time range: {relative_start}s to {relative_end}s (file duration: {len(audio_data)/sr:.2f}s)")
-                return None
-                
-            if start_sample >= end_sample:
-                logger.error(f"Invalid time range: start time ({relative_start}s) >= end time ({relative_end}s)")
-                return None
+                start_sample = int(relative_start * sr)
+                end_sample = int(relative_end * sr)
 
-            segment = audio_data[start_sample:end_sample]
-            
-            import tempfile
-            import io
+                if start_sample < 0 or end_sample > f.frames:
+                    logger.error(f"Invalid time range: {relative_start}s to {relative_end}s (file duration: {f.frames/sr:.2f}s)")
+                    return None
+
+                if start_sample >= end_sample:
+                    logger.error(f"Invalid time range: start time ({relative_start}s) >= end time ({relative_end}s)")
+                    return None
+
+                f.seek(start_sample)
+                segment = f.read(end_sample - start_sample, dtype='int16')
             
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                sf.write(temp_file.name, segment, sr, format='WAV')
-                with open(temp_file.name, 'rb') as f:
-                    wav_bytes = f.read()
-                os.unlink(temp_file.name)
+            buf = io.BytesIO()
+            sf.write(buf, segment, sr, format='WAV', subtype='PCM_16')
+            wav_bytes = buf.getvalue()
             
             logger.info(f"Successfully created WAV segment of {len(wav_bytes)} bytes")
             return wav_bytes
@@ -127,98 +190,165 @@ class AudioService:
             logger.error(f"Error getting audio segment: {str(e)}", exc_info=True)
             return None
 
-    async def process_audio_chunk(self, audio_data: str) -> Dict:
+    async def process_audio_chunk(self, audio_data: Union[bytes, str]) -> Optional[Dict]:
         try:
-            audio_bytes = base64.b64decode(audio_data)
-            audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
-            audio_float = audio_array.astype(np.float32) / 32768.0
-            
-            if len(audio_float) > 0:
-                audio_float = audio_float[::3]
-                self.audio_buffer.extend(audio_float)
-                self.full_audio_buffer.extend(audio_float)
+            if isinstance(audio_data, str):
+                audio_data = pybase64.b64decode(audio_data, validate=False)
+            audio_array = np.frombuffer(audio_data, dtype=np.int16)
+
+            if audio_array.size > 0:
+                self._append_audio(self._decimator.process(audio_array))
             
-            if len(self.audio_buffer) >= self.sample_rate:
+            if self._buf_samples >= self.sample_rate:
                 if self.processing_task is None or self.processing_task.done():
                     self.processing_task = asyncio.create_task(self._process_buffer())
-                
-            return {"type": "processing", "message": "Processing audio"}
+
+            return None
                 
         except Exception as e:
             logger.error(f"Error processing audio: {str(e)}")
             return {"type": "error", "message": str(e)}
 
-    async def _process_buffer(self, final: bool = False) -> None:
+    def _append_audio(self, audio_float: np.ndarray) -> None:
+        if audio_float.size > 0:
+            self.audio_buffer.append(audio_float)
+            self.full_audio_buffer.append(audio_float)
+            self._buf_samples += audio_float.size
+
+    def _transcribe(self, audio_data: np.ndarray) -> list:
+        segments, _ = self.whisper_model.transcribe(
+            audio_data,
+            language="en",
+            beam_size=1,
+            vad_filter=True
+        )
+        return list(segments)
+
+    def _take_window(self, chunks: List[np.ndarray]) -> np.ndarray:
+        """
+        Remove up to max_window_samples from the front of chunks and return them.
+        Only the chunk crossing the window limit is split; the rest stay queued.
+        """
+        window = []
+        taken = 0
+        count = 0
+        for chunk in chunks:
+            room = self.max_window_samples - taken
+            if chunk.size > room:
+                window.append(chunk[:room])
+                chunks[count] = chunk[room:]
+                break
+            window.append(chunk)
+            taken += chunk.size
+            count += 1
+            if taken == self.max_window_samples:
+                break
+        del chunks[:count]
+        return np.concatenate(window)
+
+    async def _transcribe_window(
+        self,
+        audio_data: np.ndarray,
+        offset_samples: int,
+        session_id: Optional[str],
+        start_time: Optional[float]
+    ) -> None:
+        buffer_offset = offset_samples / self.sample_rate
+
+        segments = await asyncio.get_event_loop().run_in_executor(
+            self._infer_exec,
+            self._transcribe,
+            audio_data
+        )
+
+        speaker_segments = diarization_service.process_audio(
+            audio_data, 
+            self.sample_rate
+        )
+
+        segments = [segment for segment in segments if segment.text.strip()]
+        seg_starts = np.array([segment.start for segment in segments], dtype=np.float64) + buffer_offset
+        seg_ends = np.array([segment.end for segment in segments], dtype=np.float64) + buffer_offset
+
+        speakers = ["UNKNOWN"] * len(segments)
+        if segments and speaker_segments:
+            spk_starts = np.array([spk_seg["start"] for spk_seg in speaker_segments], dtype=np.float64) + buffer_offset
+            spk_ends = np.array([spk_seg["end"] for spk_seg in speaker_segments], dtype=np.float64) + buffer_offset
+            spk_labels = [spk_seg["speaker"] for spk_seg in speaker_segments]
+
+            overlap = (
+                np.minimum(seg_ends[:, None], spk_ends[None, :])
+                - np.maximum(seg_starts[:, None], spk_starts[None, :])
+            )
+            best = overlap.argmax(axis=1)
+            best_overlap = overlap[np.arange(len(segments)), best]
+            speakers = [
+                spk_labels[idx] if best_overlap[i] > 0 else "UNKNOWN"
+                for i, idx in enumerate(best)
+            ]
+
+        rec_start_ts = start_time or 0.0
+
+        processed_segments = []
+        for segment, speaker, segment_start, segment_end in zip(
+            segments, speakers, seg_starts.tolist(), seg_ends.tolist()
+        ):
+            processed_segments.append({
+                "text": segment.text,
+                "speaker": speaker,
+                "start": segment_start,
+                "end": segment_end,
+                "absolute_start": rec_start_ts + segment_start,
+                "absolute_end": rec_start_ts + segment_end
+            })
+
+        if processed_segments:
+            from app.core.websocket import manager
+            message = {
+                "type": "transcription",
+                "text": " ".join(seg["text"] for seg in processed_segments),
+                "segments": processed_segments,
+                "session_id": session_id
+            }
+            await manager.broadcast(orjson.dumps(message))
+
+    async def _process_buffer(
+        self,
+        final: bool = False,
+        pending: Optional[List[np.ndarray]] = None,
+        offset_samples: int = 0,
+        session_id: Optional[str] = None,
+        start_time: Optional[float] = None
+    ) -> None:
+        """
+        Transcribe the next window of the live session buffer or, when final is
+        set, every window of the pending chunks handed over by stop_recording_session.
+        """
         async with self.processing_lock:
             try:
-                if not self.audio_buffer:
+                if final:
+                    while pending:
+                        audio_data = self._take_window(pending)
+                        await self._transcribe_window(audio_data, offset_samples, session_id, start_time)
+                        offset_samples += len(audio_data)
                     return
 
-                audio_data = np.array(self.audio_buffer)
-                
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.whisper_model.transcribe(
-                        audio_data,
-                        language="en",
-                        fp16=False
-                    )
-                )
-
-                speaker_segments = diarization_service.process_audio(
-                    audio_data, 
-                    self.sample_rate
-                )
-
-                buffer_offset = len(self.full_audio_buffer) / self.sample_rate - len(audio_data) / self.sample_rate
-
-                processed_segments = []
-                for segment in result["segments"]:
-                    if segment["text"].strip():
-                        speaker = "UNKNOWN"
-                        segment_start = segment["start"] + buffer_offset
-                        segment_end = segment["end"] + buffer_offset
-                        
-                        max_overlap = 0
-                        for spk_seg in speaker_segments:
-                            spk_start = spk_seg["start"] + buffer_offset
-                            spk_end = spk_seg["end"] + buffer_offset
-                            overlap = min(segment_end, spk_end) - max(segment_start, spk_start)
-                            if overlap > max_overlap:
-                                max_overlap = overlap
-                                speaker = spk_seg["speaker"]
-
-                        if self.recording_start_time:
-                            abs_start = self.recording_start_time.timestamp() + segment_start
-                            abs_end = self.recording_start_time.timestamp() + segment_end
-                        else:
-                            abs_start = segment_start
-                            abs_end = segment_end
-
-                        processed_segments.append({
-                            "text": segment["text"],
-                            "speaker": speaker,
-                            "start": segment_start,
-                            "end": segment_end,
-                            "absolute_start": abs_start,
-                            "absolute_end": abs_end
-                        })
-
-                if processed_segments:
-                    from app.core.websocket import manager
-                    message = {
-                        "type": "transcription",
-                        "text": " ".join(seg["text"] for seg in processed_segments),
-                        "segments": processed_segments,
-                        "session_id": self.current_session
-                    }
-                    await manager.broadcast(json.dumps(message))
-
-                self.audio_buffer = []
+                if self._buf_samples == 0:
+                    return
+
+                session_id = self.current_session
+                start_time = self.recording_start_time
+                offset_samples = self._last_transcribed_samples
+                audio_data = self._take_window(self.audio_buffer)
+                self._buf_samples -= len(audio_data)
+                self._last_transcribed_samples += len(audio_data)
+
+                await self._transcribe_window(audio_data, offset_samples, session_id, start_time)
                 
             except Exception as e:
                 logger.error(f"Error in transcription: {str(e)}")
             finally:
-                self.processing_task = None
+                if not final:
+                    self.processing_task = None
 
 audio_service = AudioService()
\ No newline at end of file
@@ -4,7 +4,6 @@ from pyannote.audio import Pipeline
 import torch
 from typing import List, Dict, Optional
 from huggingface_hub import HfFolder, snapshot_download
-from collections import deque
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +11,15 @@ class DiarizationService:
     def __init__(self):
         self.pipeline: Optional[Pipeline] = None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.audio_buffer = deque(maxlen=16000 * 30)
+        self.buffer_size = 16000 * 30
+        self.audio_buffer = np.zeros(self.buffer_size, dtype=np.float32)
+        self._write = 0
+        self._filled = 0
+        self._pin_buf: Optional[torch.Tensor] = None
+        self._gpu_buf: Optional[torch.Tensor] = None
+        if self.device.type == "cuda":
+            self._pin_buf = torch.empty(1, self.buffer_size, pin_memory=True)
+            self._gpu_buf = torch.empty(1, self.buffer_size, device=self.device)
         self.initialize_pipeline()
 
     def initialize_pipeline(self):
@@ -77,6 +84,20 @@ class DiarizationService:
             logger.error(f"Error in diarization initialization: {str(e)}")
             self.pipeline = None
 
+    def _append_to_buffer(self, audio_data: np.ndarray) -> None:
+        audio_data = audio_data.astype(np.float32, copy=False)[-self.buffer_size:]
+        n = len(audio_data)
+        first = min(n, self.buffer_size - self._write)
+        np.copyto(self.audio_buffer[self._write:self._write + first], audio_data[:first])
+        np.copyto(self.audio_buffer[:n - first], audio_data[first:])
+        self._write = (self._write + n) % self.buffer_size
+        self._filled = min(self._filled + n, self.buffer_size)
+
+    def _buffered_audio(self) -> np.ndarray:
+        if self._filled < self.buffer_size:
+            return self.audio_buffer[:self._filled]
+        return np.concatenate((self.audio_buffer[self._write:], self.audio_buffer[:self._write]))
+
     def process_audio(self, audio_data: np.ndarray, sample_rate: int) -> List[Dict]:
         """
         Process audio data and return speaker segments.
@@ -87,18 +108,20 @@ class DiarizationService:
             return []
 
         try:
-            self.audio_buffer.extend(audio_data.tolist())
+            self._append_to_buffer(audio_data)
             
-            accumulated_audio = np.array(list(self.audio_buffer))
+            accumulated_audio = self._buffered_audio()
             
             if len(accumulated_audio) < sample_rate * 5:
                 return []
 
-            waveform = torch.from_numpy(accumulated_audio).float()
-            if len(waveform.shape) == 1:
-                waveform = waveform.unsqueeze(0)
-
-            waveform = waveform.to(self.device)
+            n = len(accumulated_audio)
+            if self._gpu_buf is not None:
+                self._pin_buf[0, :n].copy_(torch.from_numpy(accumulated_audio))
+                self._gpu_buf[0, :n].copy_(self._pin_buf[0, :n], non_blocking=True)
+                waveform = self._gpu_buf[:, :n]
+            else:
+                waveform = torch.from_numpy(accumulated_audio).unsqueeze(0)
 
             diarization = self.pipeline(
                 {"waveform": waveform, "sample_rate": sample_rate},
@@ -5,7 +5,7 @@ export interface UseAudioRecorderReturn {
     error: Ref<string | null>
     startRecording: () => Promise<void>
     stopRecording: () => void
-    setAudioDataCallback: (callback: (audioData: { type: string, data: string, sampleRate: number }) => void) => void
+    setAudioDataCallback: (callback: (audioData: { type: string, data: Uint8Array, sampleRate: number }) => void) => void
 }
 
 export function useAudioRecorder(): UseAudioRecorderReturn {
@@ -15,7 +15,7 @@ export function useAudioRecorder(): UseAudioRecorderReturn {
     let audioContext: AudioContext | null = null
     let processor: ScriptProcessorNode | null = null
     let audioStream: MediaStream | null = null
-    let onAudioData: ((audioData: { type: string, data: string, sampleRate: number }) => void) | null = null
+    let onAudioData: ((audioData: { type: string, data: Uint8Array, sampleRate: number }) => void) | null = null
     let audioBuffer: Float32Array | null = null
     const BUFFER_SIZE = 8192 // Increased buffer size for better quality
     const MIN_AMPLITUDE = 0.01 // Minimum amplitude threshold
@@ -100,16 +100,9 @@ export function useAudioRecorder(): UseAudioRecorderReturn {
                             pcmData[i] = Math.max(-32768, Math.min(32767, Math.round(audioBuffer[i] * 32768)))
                         }
 
-                        // Convert to base64
-                        const base64Data = btoa(
-                            Array.from(new Uint8Array(pcmData.buffer))
-                                .map(byte => String.fromCharCode(byte))
-                                .join('')
-                        )
-                        
                         onAudioData({
                             type: 'chunk',
-                            data: base64Data,
+                            data: new Uint8Array(pcmData.buffer),
                             sampleRate: audioContext?.sampleRate || 48000
                         })
                         
@@ -139,7 +132,7 @@ export function useAudioRecorder(): UseAudioRecorderReturn {
         cleanup()
     }
 
-    function setAudioDataCallback(callback: (audioData: { type: string, data: string, sampleRate: number }) => void) {
+    function setAudioDataCallback(callback: (audioData: { type: string, data: Uint8Array, sampleRate: number }) => void) {
         onAudioData = callback
     }
 
@@ -41,20 +41,42 @@ export interface UseWebSocketReturn {
     lastMessage: Ref<WebSocketMessage | null>
     error: Ref<string | null>
     sendMessage: (message: WebSocketMessage) => void
+    sendAudioData: (audio: Uint8Array) => void
     startRecording: () => Promise<void>
     stopRecording: () => void
 }
 
+// MessagePack encoding of {"type": "audio_data", "audio": <bin 32>}; only the
+// payload length varies, so the frame is built by hand instead of pulling in a
+// MessagePack library for a single message shape.
+const AUDIO_FRAME_HEADER = new Uint8Array([
+    0x82,
+    0xa4, ...new TextEncoder().encode('type'),
+    0xaa, ...new TextEncoder().encode('audio_data'),
+    0xa5, ...new TextEncoder().encode('audio'),
+    0xc6
+])
+
+function encodeAudioFrame(audio: Uint8Array): Uint8Array {
+    const frame = new Uint8Array(AUDIO_FRAME_HEADER.length + 4 + audio.length)
+    frame.set(AUDIO_FRAME_HEADER, 0)
+    new DataView(frame.buffer).setUint32(AUDIO_FRAME_HEADER.length, audio.length)
+    frame.set(audio, AUDIO_FRAME_HEADER.length + 4)
+    return frame
+}
+
 export function useWebSocket(url: string): UseWebSocketReturn {
     const isConnected = ref(false)
     const lastMessage = ref<WebSocketMessage | null>(null)
     const error = ref<string | null>(null)
     let ws: WebSocket | null = null
+    const textDecoder = new TextDecoder()
 
     function connect() {
         return new Promise<void>((resolve, reject) => {
             try {
                 ws = new WebSocket(url)
+                ws.binaryType = 'arraybuffer'
 
                 ws.onopen = () => {
                     isConnected.value = true
@@ -74,7 +96,11 @@ export function useWebSocket(url: string): UseWebSocketReturn {
 
                 ws.onmessage = (event) => {
                     try {
-                        const message = JSON.parse(event.data) as WebSocketMessage
+                        // Broadcasts arrive as binary frames holding UTF-8 JSON
+                        const data = typeof event.data === 'string'
+                            ? event.data
+                            : textDecoder.decode(event.data)
+                        const message = JSON.parse(data) as WebSocketMessage
                         lastMessage.value = message
                     } catch (err) {
                         console.error('Error parsing WebSocket message:', err)
@@ -103,6 +129,14 @@ export function useWebSocket(url: string): UseWebSocketReturn {
         ws.send(JSON.stringify(message))
     }
 
+    function sendAudioData(audio: Uint8Array) {
+        if (!ws || ws.readyState !== WebSocket.OPEN) {
+            error.value = 'WebSocket is not connected'
+            return
+        }
+        ws.send(encodeAudioFrame(audio))
+    }
+
     async function startRecording() {
         if (!isConnected.value) {
             await connect()
@@ -126,6 +160,7 @@ export function useWebSocket(url: string): UseWebSocketReturn {
         lastMessage,
         error,
         sendMessage,
+        sendAudioData,
         startRecording,
         stopRecording
     }